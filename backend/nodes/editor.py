@@ -1,205 +1,65 @@
-import json
+import asyncio
 import logging
 import os
-from typing import Any, Dict, List, Tuple
+import re
+import string
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
+import orjson
 from langchain_core.messages import AIMessage
-from openai import AsyncOpenAI
-from backend.services.bjb_postgres_client import get_connection
-from psycopg2.extras import RealDictCursor
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+from backend.services.bjb_postgres_client import get_products_context, get_products_etag
+from backend.services.llm_cache import get_llm_cache
+from backend.services.openai_batch import response_text, submit_batch, wait_for_batch
 from ..classes import ResearchState
 from ..utils.references import format_references_section
 
 logger = logging.getLogger(__name__)
 
-class Editor:
-    """Compiles individual section briefings into a cohesive final report."""
+# Streamed report text is forwarded to the WebSocket once this many characters
+# have accumulated, or once at least _STREAM_FLUSH_MIN_CHARS are buffered and
+# this many seconds have passed since the last flush.
+_STREAM_FLUSH_CHARS = 512
+_STREAM_FLUSH_MIN_CHARS = 128
+_STREAM_FLUSH_INTERVAL = 0.5
 
-    def __init__(self) -> None:
-        self.openai_key = os.getenv("OPENAI_API_KEY")
-        if not self.openai_key:
-            raise ValueError("OPENAI_API_KEY environment variable is not set")
+# Matches a leading ```json / ``` fence or a trailing ``` the model sometimes adds.
+_JSON_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$', re.S)
 
-        self.openai_client = AsyncOpenAI(api_key=self.openai_key)
+# A Company Overview matching this describes a company that is bankrupt,
+# liquidating or no longer operating, where the recommendation prompt's first
+# rule returns []. Only that section is checked so that news about competitors
+# or reference titles do not trigger it.
+_NON_OPERATIONAL_RE = re.compile(r"\b(bangkrut|pailit|likuidasi|dalam likuidasi|tidak beroperasi)\b", re.I)
+_COMPANY_OVERVIEW_RE = re.compile(r"^##\s+Company Overview\s*$(.*?)(?=^##\s|\Z)", re.M | re.S | re.I)
 
-        self.context = {
-            "company": "Unknown Company",
-            "industry": "Unknown",
-            "hq_location": "Unknown"
-        }
-
-    async def compile_briefings(self, state: ResearchState) -> ResearchState:
-        company = state.get('company', 'Unknown Company')
-        self.context = {
-            "company": company,
-            "industry": state.get('industry', 'Unknown'),
-            "hq_location": state.get('hq_location', 'Unknown')
-        }
+_RECOMMENDATION_SYSTEM_PROMPT = "Kamu adalah AI assistant untuk bank yang bertugas menyarankan produk berdasarkan analisis riset perusahaan."
+_COMPILE_SYSTEM_PROMPT = "You are an expert report editor that compiles research briefings into comprehensive company reports."
+_SWEEP_SYSTEM_PROMPT = "You are an expert markdown formatter that ensures consistent document structure."
 
-        if websocket_manager := state.get('websocket_manager'):
-            if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
-                    job_id=job_id,
-                    status="processing",
-                    message=f"Starting report compilation for {company}",
-                    result={"step": "Editor", "substep": "initialization"}
-                )
-
-        context = {
-            "company": company,
-            "industry": state.get('industry', 'Unknown'),
-            "hq_location": state.get('hq_location', 'Unknown')
-        }
-
-        msg = [f"📑 Compiling final report for {company}..."]
-        briefing_keys = {
-            'company': 'company_briefing',
-            'industry': 'industry_briefing',
-            'financial': 'financial_briefing',
-            'news': 'news_briefing'
-        }
-
-        if websocket_manager := state.get('websocket_manager'):
-            if job_id := state.get('job_id'):
-                await websocket_manager.send_status_update(
-                    job_id=job_id,
-                    status="processing",
-                    message="Collecting section briefings",
-                    result={"step": "Editor", "substep": "collecting_briefings"}
-                )
-
-        individual_briefings = {}
-        for category, key in briefing_keys.items():
-            if content := state.get(key):
-                individual_briefings[category] = content
-                msg.append(f"Found {category} briefing ({len(content)} characters)")
-            else:
-                msg.append(f"No {category} briefing available")
-                logger.error(f"Missing state key: {key}")
-
-        if not individual_briefings:
-            msg.append("\n⚠️ No briefing sections available to compile")
-            logger.error("No briefings found in state")
-        else:
-            try:
-                compiled_report = await self.edit_report(state, individual_briefings, context)
-                if not compiled_report:
-                    logger.error("Compiled report is empty!")
-                else:
-                    logger.info(f"Successfully compiled report")
-            except Exception as e:
-                logger.error(f"Error during report compilation: {e}")
-        state.setdefault('messages', []).append(AIMessage(content="\n".join(msg)))
-        return state
-    
-    async def edit_report(self, state: ResearchState, briefings: Dict[str, str], context: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
-        """Compile section briefings into a final report and update the state."""
-        try:
-            company = self.context["company"]
-            if websocket_manager := state.get('websocket_manager'):
-                if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
-                        job_id=job_id,
-                        status="processing",
-                        message="Compiling initial research report",
-                        result={"step": "Editor", "substep": "compilation"}
-                    )
-
-            edited_report = await self.compile_content(state, briefings, company)
-            if not edited_report:
-                logger.error("Initial compilation failed")
-                return ""
-
-            if websocket_manager := state.get('websocket_manager'):
-                if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
-                        job_id=job_id,
-                        status="processing",
-                        message="Cleaning up and organizing report",
-                        result={"step": "Editor", "substep": "cleanup"}
-                    )
-
-            if websocket_manager := state.get('websocket_manager'):
-                if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
-                        job_id=job_id,
-                        status="processing",
-                        message="Formatting final report",
-                        result={"step": "Editor", "substep": "format"}
-                    )
-
-            final_report = await self.content_sweep(state, edited_report, company)
-            final_report = final_report or ""
-
-            logger.info(f"Final report compiled with {len(final_report)} characters")
-            if not final_report.strip():
-                logger.error("Final report is empty!")
-                return ""
-
-            logger.info("Final report preview:")
-            logger.info(final_report[:500])
-
-            state['report'] = final_report
-            state['status'] = "editor_complete"
-
-            if 'editor' not in state or not isinstance(state['editor'], dict):
-                state['editor'] = {}
-            state['editor']['report'] = final_report
-            logger.info(f"Report length in state: {len(state.get('report', ''))}")
-
-            product_recommendation = []
-            try:
-                with get_connection() as conn:
-                    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                        cursor.execute("SELECT * FROM products WHERE deleted_at IS NULL")
-                        all_products = cursor.fetchall()
-
-                product_context = "\n".join([
-                    f"- [ID: {p['id']}] {p['name']}\n  Deskripsi: {p.get('description', '-')}\n  Catatan: {p.get('note', '-')}\n  Prioritas: {p.get('priority', '-')}\n  Link: {p.get('link', '-')}\n"
-                    for p in all_products
-                ])
-                recommendation_json_str = await self.generate_product_recommendation_json(context, final_report, product_context)
-                product_recommendation = json.loads(recommendation_json_str)
-                state['product_recommendation'] = product_recommendation
-            except Exception as e:
-                logger.error(f"Gagal memuat atau parse rekomendasi produk AI: {e}")
-                state['product_recommendation'] = []
-            
-            if websocket_manager := state.get('websocket_manager'):
-                if job_id := state.get('job_id'):
-                    await websocket_manager.send_status_update(
-                        job_id=job_id,
-                        status="editor_complete",
-                        message="Research report completed",
-                        result={
-                            "step": "Editor",
-                            "report": final_report,
-                            "company": company,
-                            "is_final": True,
-                            "status": "completed",
-                            "product_recommendation": product_recommendation
-                        }
-                    )
-            
-            return final_report, product_recommendation
-        except Exception as e:
-            logger.error(f"Error in edit_report: {e}")
-            return ""
-        
-    async def generate_product_recommendation_json(self, context: Dict[str, Any], final_report: str, product_context: str) -> str:
-        prompt = f"""
+_RECOMMENDATION_PROMPT_TMPL = string.Template("""
 Kamu adalah asisten cerdas dari Bank BJB. Berdasarkan profil perusahaan berikut ini, pilih produk yang relevan untuk ditawarkan.
 
 ## Profil Perusahaan:
-Nama: {context['company']}
-Industri: {context['industry']}
-Lokasi Kantor Pusat: {context['hq_location']}
+Nama: $company
+Industri: $industry
+Lokasi Kantor Pusat: $hq_location
 
 ## Ringkasan Riset:
-{final_report}
+$final_report
 
 ## Daftar Produk:
-{product_context}
+$product_context
 
 ## Instruksi:
 1. Jika perusahaan ini dinyatakan bangkrut, pailit, sedang dalam proses likuidasi, atau tidak beroperasi lagi, maka JANGAN rekomendasikan produk apapun. Langsung balas dengan array kosong: []
@@ -214,62 +74,27 @@ Lokasi Kantor Pusat: {context['hq_location']}
 6. Gunakan struktur JSON seperti di bawah. **Isi `product_id` hanya dengan nilai ID numerik (angka integer) yang tersedia di daftar produk (yaitu `product.id`) — JANGAN MENGARANG.**
 7. Struktur JSON:
 [
-  {{
+  {
     "product_id": 1,  // HARUS sama persis dengan ID produk di daftar
     "product_name": "Nama produk",
     "reason": "Jelaskan alasan produk ini cocok dan mengapa perusahaan ini penting bagi Bank BJB.",
     "potential": "Tuliskan potensi bisnis yang bisa didapatkan dari perusahaan ini",
     "reminder_notes": "Tambahkan catatan atau link terkait produk ini (jika ada) berdasarkan NOTES",
     "action": "Langkah yang perlu dilakukan tim Bank BJB terhadap perusahaan ini"
-  }}
+  }
 ]
 8. Hanya tampilkan produk yang benar-benar relevan.
 9. Jangan tampilkan produk yang tidak relevan atau tidak ada di daftar produk.
 10. Jangan menambahkan penjelasan lain di luar format JSON.
 11. Balas hanya dalam format JSON. Tanpa markdown, tanpa komentar, dan tanpa teks di luar JSON.
-"""
+""")
 
-        response = await self.openai_client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": "Kamu adalah AI assistant untuk bank yang bertugas menyarankan produk berdasarkan analisis riset perusahaan."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        return response.choices[0].message.content.strip()
-    
-    async def compile_content(self, state: ResearchState, briefings: Dict[str, str], company: str) -> str:
-        """Initial compilation of research sections."""
-        combined_content = "\n\n".join(content for content in briefings.values())
-        
-        references = state.get('references', [])
-        reference_text = ""
-        if references:
-            logger.info(f"Found {len(references)} references to add during compilation")
-            
-            # Get pre-processed reference info from curator
-            reference_info = state.get('reference_info', {})
-            reference_titles = state.get('reference_titles', {})
-            
-            logger.info(f"Reference info from state: {reference_info}")
-            logger.info(f"Reference titles from state: {reference_titles}")
-            
-            # Use the references module to format the references section
-            reference_text = format_references_section(references, reference_info, reference_titles)
-            logger.info(f"Added {len(references)} references during compilation")
-        
-        # Use values from centralized context
-        company = self.context["company"]
-        industry = self.context["industry"]
-        hq_location = self.context["hq_location"]
-        
-        prompt = f"""You are compiling a comprehensive research report about {company}.
+_COMPILE_PROMPT_TMPL = string.Template("""You are compiling a comprehensive research report about $company.
 
 Compiled briefings:
-{combined_content}
+$combined_content
 
-Create a comprehensive and focused report on {company}, a {industry} company headquartered in {hq_location} that:
+Create a comprehensive and focused report on $company, a $industry company headquartered in $hq_location that:
 1. Integrates information from all sections into a cohesive non-repetitive narrative
 2. Maintains important details from each section
 3. Logically organizes information and removes transitional commentary / explanations
@@ -278,7 +103,7 @@ Create a comprehensive and focused report on {company}, a {industry} company hea
 Formatting rules:
 Strictly enforce this EXACT document structure:
 
-# {company} Research Report
+# $company Research Report
 
 ## Company Overview
 [Company content with ### subsections]
@@ -292,49 +117,15 @@ Strictly enforce this EXACT document structure:
 ## News
 [News content with ### subsections]
 
-Return the report using Bahasa Indonesia and in clean markdown format. No explanations or commentary."""
-        
-        try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert report editor that compiles research briefings into comprehensive company reports."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0,
-                stream=False
-            )
-            initial_report = response.choices[0].message.content.strip()
-            
-            # Append the references section after LLM processing
-            if reference_text:
-                initial_report = f"{initial_report}\n\n{reference_text}"
-            
-            return initial_report
-        except Exception as e:
-            logger.error(f"Error in initial compilation: {e}")
-            return (combined_content or "").strip()
-        
-    async def content_sweep(self, state: ResearchState, content: str, company: str) -> str:
-        """Sweep the content for any redundant information."""
-        # Use values from centralized context
-        company = self.context["company"]
-        industry = self.context["industry"]
-        hq_location = self.context["hq_location"]
-        
-        prompt = f"""You are an expert briefing editor. You are given a report on {company}.
+Return the report using Bahasa Indonesia and in clean markdown format. No explanations or commentary.""")
+
+_SWEEP_PROMPT_TMPL = string.Template("""You are an expert briefing editor. You are given a report on $company.
 
 Current report:
-{content}
+$content
 
 1. Remove redundant or repetitive information
-2. Remove information that is not relevant to {company}, the {industry} company headquartered in {hq_location}.
+2. Remove information that is not relevant to $company, the $industry company headquartered in $hq_location.
 3. Remove sections lacking substantial content
 4. Remove any meta-commentary (e.g. "Here is the news...")
 
@@ -356,7 +147,7 @@ Strictly enforce this EXACT document structure:
 [References in MLA format - PRESERVE EXACTLY AS PROVIDED]
 
 Critical rules:
-1. The document MUST start with "# {company} Research Report"
+1. The document MUST start with "# $company Research Report"
 2. The document MUST ONLY use these exact ## headers in this order:
    - ## Company Overview
    - ## Industry Overview
@@ -374,43 +165,477 @@ Critical rules:
 
 Return the polished report in flawless markdown format. No explanation.
 
-Return the cleaned report in flawless markdown format. No explanations or commentary."""
+Return the cleaned report in flawless markdown format. No explanations or commentary.""")
+
+_BRIEFING_KEYS = {
+    'company': 'company_briefing',
+    'industry': 'industry_briefing',
+    'financial': 'financial_briefing',
+    'news': 'news_briefing'
+}
+
+# text-embedding-3-small accepts at most 8191 tokens; reports are cut well below
+# that before embedding for the semantic cache.
+_EMBED_MAX_CHARS = 16000
+
+# Per-request timeouts (seconds) for OpenAI calls. Streaming and full report
+# compilation get more room since they cover a whole long generation.
+_CHAT_TIMEOUT = 60.0
+_COMPILE_TIMEOUT = 120.0
+_STREAM_TIMEOUT = 120.0
+
+# (api key, client) so a changed key builds a new client instead of reusing the old one.
+_CLIENT: Optional[Tuple[str, AsyncOpenAI]] = None
+
+def _is_retryable(error: BaseException) -> bool:
+    """Match the errors the OpenAI SDK itself retries: 408, 409, 429, 5xx and connection failures."""
+    if isinstance(error, (RateLimitError, APIConnectionError, InternalServerError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in (408, 409)
+
+def _is_non_operational(report: str) -> bool:
+    """Check the report's Company Overview for signs the company no longer operates.
+
+    Reports without a Company Overview section are left to the model.
+    """
+    match = _COMPANY_OVERVIEW_RE.search(report)
+    return bool(match and _NON_OPERATIONAL_RE.search(match.group(1)))
+
+def _strip_fences(text: str) -> str:
+    """Remove markdown code fences wrapped around a JSON response."""
+    return _JSON_FENCE_RE.sub("", text)
+
+def _reference_text(state: ResearchState) -> str:
+    """Format the references section from the curator's pre-processed reference info."""
+    references = state.get('references', [])
+    if not references:
+        return ""
+
+    logger.info("Found %d references to add during compilation", len(references))
+    
+    # Get pre-processed reference info from curator
+    reference_info = state.get('reference_info', {})
+    reference_titles = state.get('reference_titles', {})
+    
+    logger.debug("Reference info from state: %s", reference_info)
+    logger.debug("Reference titles from state: %s", reference_titles)
+    
+    # Use the references module to format the references section
+    reference_text = format_references_section(references, reference_info, reference_titles)
+    logger.info("Added %d references during compilation", len(references))
+    return reference_text
+
+def _compile_messages(company: str, industry: str, hq_location: str, combined_content: str) -> List[Dict[str, str]]:
+    prompt = _COMPILE_PROMPT_TMPL.substitute(
+        company=company,
+        combined_content=combined_content,
+        industry=industry,
+        hq_location=hq_location
+    )
+    return [
+        {
+            "role": "system",
+            "content": _COMPILE_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def _sweep_messages(company: str, industry: str, hq_location: str, content: str) -> List[Dict[str, str]]:
+    prompt = _SWEEP_PROMPT_TMPL.substitute(
+        company=company,
+        content=content,
+        industry=industry,
+        hq_location=hq_location
+    )
+    return [
+        {
+            "role": "system",
+            "content": _SWEEP_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def _recommendation_messages(context: Dict[str, Any], final_report: str, product_context: str) -> List[Dict[str, str]]:
+    prompt = _RECOMMENDATION_PROMPT_TMPL.substitute(
+        company=context['company'],
+        industry=context['industry'],
+        hq_location=context['hq_location'],
+        final_report=final_report,
+        product_context=product_context
+    )
+    return [
+        {"role": "system", "content": _RECOMMENDATION_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+class _StatusSender:
+    """Binds the job's WebSocket manager once and sends status updates to it."""
+
+    def __init__(self, state: ResearchState) -> None:
+        self.websocket_manager = state.get('websocket_manager')
+        self.job_id = state.get('job_id')
+        # Whether a client is attached to receive updates.
+        self.attached = bool(self.websocket_manager and self.job_id)
+
+    async def __call__(self, **kwargs: Any) -> None:
+        if self.attached:
+            await self.websocket_manager.send_status_update(job_id=self.job_id, **kwargs)
+
+def _get_client(api_key: str) -> AsyncOpenAI:
+    """Return the OpenAI client shared by all Editor instances.
+
+    A new Editor is built for every research job, so sharing one client keeps
+    a single connection pool sized for many concurrent jobs. The client is
+    rebuilt if called with a different API key.
+    """
+    global _CLIENT
+    if _CLIENT is None or _CLIENT[0] != api_key:
+        _CLIENT = api_key, AsyncOpenAI(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+            )
+        )
+    return _CLIENT[1]
+
+class Editor:
+    """Compiles individual section briefings into a cohesive final report."""
+
+    def __init__(self) -> None:
+        self.openai_key = os.getenv("OPENAI_API_KEY")
+        if not self.openai_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+
+        self.openai_client = _get_client(self.openai_key)
+        self.llm_cache = get_llm_cache()
+        # The recommendation prompt only needs the compiled report, so by default
+        # it runs alongside content_sweep instead of waiting for the polished one.
+        self.parallel_recommendation = os.getenv("EDITOR_PARALLEL_RECOMMENDATION", "true").lower() == "true"
+
+        self.context = {
+            "company": "Unknown Company",
+            "industry": "Unknown",
+            "hq_location": "Unknown"
+        }
+
+    async def compile_briefings(self, state: ResearchState) -> ResearchState:
+        company = state.get('company', 'Unknown Company')
+        industry = state.get('industry', 'Unknown')
+        hq_location = state.get('hq_location', 'Unknown')
+        send_status = _StatusSender(state)
+        context = {
+            "company": company,
+            "industry": industry,
+            "hq_location": hq_location
+        }
+        self.context = context
+
+        await send_status(
+            status="processing",
+            message=f"Starting report compilation for {company}",
+            result={"step": "Editor", "substep": "initialization"}
+        )
+
+        msg = [f"📑 Compiling final report for {company}..."]
+
+        await send_status(
+            status="processing",
+            message="Collecting section briefings",
+            result={"step": "Editor", "substep": "collecting_briefings"}
+        )
+
+        individual_briefings = {}
+        for category, key in _BRIEFING_KEYS.items():
+            if content := state.get(key):
+                individual_briefings[category] = content
+                msg.append(f"Found {category} briefing ({len(content)} characters)")
+            else:
+                msg.append(f"No {category} briefing available")
+                logger.error(f"Missing state key: {key}")
+
+        if not individual_briefings:
+            msg.append("\n⚠️ No briefing sections available to compile")
+            logger.error("No briefings found in state")
+        else:
+            try:
+                compiled_report, _ = await self.edit_report(state, individual_briefings, context)
+                if not compiled_report:
+                    logger.error("Compiled report is empty!")
+                else:
+                    logger.info(f"Successfully compiled report")
+            except Exception as e:
+                logger.error(f"Error during report compilation: {e}")
+        state.setdefault('messages', []).append(AIMessage(content="\n".join(msg)))
+        return state
+    
+    async def edit_report(self, state: ResearchState, briefings: Dict[str, str],
+                          context: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Compile section briefings into a final report and update the state."""
+        # The product catalog does not depend on the report, so load it while
+        # the LLM calls run.
+        products_task = asyncio.create_task(get_products_context())
+        send_status = _StatusSender(state)
+        recommendation_started = False
+        try:
+            company = context["company"]
+            industry = context["industry"]
+            hq_location = context["hq_location"]
+            await send_status(
+                status="processing",
+                message="Compiling initial research report",
+                result={"step": "Editor", "substep": "compilation"}
+            )
+
+            edited_report = await self.compile_content(state, briefings, company, industry, hq_location)
+            if not edited_report:
+                logger.error("Initial compilation failed")
+                return "", []
+
+            await send_status(
+                status="processing",
+                message="Formatting final report",
+                result={"step": "Editor", "substep": "format"}
+            )
+
+            if self.parallel_recommendation:
+                recommendation_started = True
+                final_report, product_recommendation = await asyncio.gather(
+                    self.content_sweep(state, edited_report, company, industry, hq_location),
+                    self.recommend_products(context, edited_report, products_task)
+                )
+            else:
+                final_report = await self.content_sweep(state, edited_report, company, industry, hq_location)
+            final_report = final_report or ""
+
+            logger.info("Final report compiled with %d characters", len(final_report))
+            if not final_report.strip():
+                logger.error("Final report is empty!")
+                return "", []
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Final report preview:\n%s", final_report[:500])
+
+            state['report'] = final_report
+            state['status'] = "editor_complete"
+
+            if 'editor' not in state or not isinstance(state['editor'], dict):
+                state['editor'] = {}
+            state['editor']['report'] = final_report
+            logger.info("Report length in state: %d", len(final_report))
+
+            if not self.parallel_recommendation:
+                recommendation_started = True
+                product_recommendation = await self.recommend_products(context, final_report, products_task)
+            state['product_recommendation'] = product_recommendation
+            
+            await send_status(
+                status="editor_complete",
+                message="Research report completed",
+                result={
+                    "step": "Editor",
+                    "report": final_report,
+                    "company": company,
+                    "is_final": True,
+                    "status": "completed",
+                    "product_recommendation": product_recommendation
+                }
+            )
+            
+            return final_report, product_recommendation
+        except Exception as e:
+            logger.error("Error in edit_report: %s", e)
+            return "", []
+        finally:
+            if not products_task.done():
+                products_task.cancel()
+            elif (not products_task.cancelled() and (error := products_task.exception())
+                  and not recommendation_started):
+                # exception() marks the failure as retrieved; recommend_products
+                # already logs it when it awaited the task.
+                logger.warning("Product catalog load failed: %s", error)
         
+    async def recommend_products(self, context: Dict[str, Any], report: str, products_task: "asyncio.Task[str]") -> List[Dict[str, Any]]:
+        """Generate and parse product recommendations, returning [] on failure."""
+        if _is_non_operational(report):
+            logger.info("Skipping product recommendation for %s: report flags it as non-operational", context['company'])
+            return []
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4.1-mini", 
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert markdown formatter that ensures consistent document structure."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            product_context = await products_task
+            recommendation_json_str = await self.generate_product_recommendation_json(context, report, product_context)
+            return orjson.loads(_strip_fences(recommendation_json_str))
+        except Exception as e:
+            logger.error("Gagal memuat atau parse rekomendasi produk AI: %s", e)
+            return []
+
+    async def generate_product_recommendation_json(self, context: Dict[str, Any], final_report: str, product_context: str) -> str:
+        return await self.cached_chat(
+            model="gpt-4.1",
+            messages=_recommendation_messages(context, final_report, product_context),
+            temperature=0.3,
+            # Only the report varies between runs; the instructions and catalog
+            # are pinned by the scope so other companies never match.
+            semantic_text=final_report,
+            semantic_scope=("gpt-4.1", context['company'], get_products_etag())
+        )
+
+    async def chat(self, **kwargs: Any) -> Any:
+        """Create a chat completion, retrying transient API errors with jittered backoff."""
+        # SDK retries are disabled for this call only so they do not stack with ours.
+        client = self.openai_client.with_options(max_retries=0)
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception(_is_retryable),
+            wait=wait_random_exponential(min=1, max=20),
+            stop=stop_after_attempt(4),
+            reraise=True
+        ):
+            with attempt:
+                return await client.chat.completions.create(**kwargs)
+
+    async def cached_chat(self, model: str, messages: List[Dict[str, str]], temperature: float,
+                          semantic_text: Optional[str] = None, semantic_scope: Optional[Tuple[Any, ...]] = None,
+                          timeout: float = _CHAT_TIMEOUT) -> str:
+        """Run a non-streaming chat completion through the shared response cache.
+
+        Deterministic (temperature 0) calls are cached by exact match. Sampled
+        calls are only cached when ``semantic_text`` and ``semantic_scope`` are
+        given and semantic caching is enabled, in which case the embedding of
+        ``semantic_text`` is matched against earlier entries in the same scope.
+        """
+        key = self.llm_cache.make_key(model, messages, temperature)
+        exact = temperature == 0
+        if exact and (cached := self.llm_cache.get(key)) is not None:
+            self.llm_cache.record_hit()
+            return cached
+
+        embedding = None
+        if semantic_text and semantic_scope and self.llm_cache.semantic_enabled:
+            embedding = await self.embed(semantic_text[:_EMBED_MAX_CHARS])
+            if embedding is not None and (cached := self.llm_cache.get_similar(semantic_scope, embedding)) is not None:
+                self.llm_cache.record_hit()
+                return cached
+
+        self.llm_cache.record_miss()
+        response = await self.chat(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout
+        )
+        choice = response.choices[0]
+        content = choice.message.content.strip()
+
+        # Truncated or filtered completions are returned but never cached.
+        if choice.finish_reason == "stop":
+            if exact:
+                self.llm_cache.set(key, content)
+            if embedding is not None:
+                self.llm_cache.add_similar(semantic_scope, embedding, content)
+        return content
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for semantic cache lookups, returning None on failure."""
+        try:
+            response = await self.openai_client.embeddings.create(
+                model="text-embedding-3-small",
+                input=text,
+                timeout=_CHAT_TIMEOUT
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logger.warning(f"Embedding for semantic cache failed: {e}")
+            return None
+    
+    async def compile_content(self, state: ResearchState, briefings: Dict[str, str],
+                              company: str, industry: str, hq_location: str) -> str:
+        """Initial compilation of research sections."""
+        combined_content = "\n\n".join(briefings.values())
+        
+        reference_text = _reference_text(state)
+        
+        try:
+            initial_report = await self.cached_chat(
+                model="gpt-4.1",
+                messages=_compile_messages(company, industry, hq_location, combined_content),
                 temperature=0,
-                stream=True
+                timeout=_COMPILE_TIMEOUT
             )
             
+            # Append the references section after LLM processing
+            if reference_text:
+                initial_report = f"{initial_report}\n\n{reference_text}"
+            
+            return initial_report
+        except Exception as e:
+            logger.error("Error in initial compilation: %s", e)
+            return (combined_content or "").strip()
+        
+    async def content_sweep(self, state: ResearchState, content: str,
+                            company: str, industry: str, hq_location: str) -> str:
+        """Sweep the content for any redundant information."""
+        messages = _sweep_messages(company, industry, hq_location, content)
+        send_status = _StatusSender(state)
+
+        try:
+            # Without a client to stream to, a single non-streaming request is
+            # cheaper than parsing the response token by token.
+            if not send_status.attached:
+                return await self.cached_chat(
+                    model="gpt-4.1-mini",
+                    messages=messages,
+                    temperature=0,
+                    timeout=_COMPILE_TIMEOUT
+                )
+
+            cache_key = self.llm_cache.make_key("gpt-4.1-mini", messages, 0)
+            if (cached := self.llm_cache.get(cache_key)) is not None:
+                self.llm_cache.record_hit()
+                await send_status(
+                    status="report_chunk",
+                    message="Formatting final report",
+                    result={
+                        "chunk": cached,
+                        "step": "Editor"
+                    }
+                )
+                return cached
+
+            self.llm_cache.record_miss()
+            response = await self.chat(
+                model="gpt-4.1-mini",
+                messages=messages,
+                temperature=0,
+                stream=True,
+                timeout=_STREAM_TIMEOUT
+            )
+
+            async def send_chunk(previous: Optional[asyncio.Task], text: str) -> None:
+                # Chain on the previous send so chunks reach the client in order.
+                if previous:
+                    await previous
+                await send_status(
+                    status="report_chunk",
+                    message="Formatting final report",
+                    result={
+                        "chunk": text,
+                        "step": "Editor"
+                    }
+                )
+
             accumulated_text = ""
             buffer = ""
+            completed = False
+            send_task: Optional[asyncio.Task] = None
+            last_flush = time.monotonic()
             
             async for chunk in response:
                 if chunk.choices[0].finish_reason == "stop":
-                    websocket_manager = state.get('websocket_manager')
-                    if websocket_manager and buffer:
-                        job_id = state.get('job_id')
-                        if job_id:
-                            await websocket_manager.send_status_update(
-                                job_id=job_id,
-                                status="report_chunk",
-                                message="Formatting final report",
-                                result={
-                                    "chunk": buffer,
-                                    "step": "Editor"
-                                }
-                            )
+                    completed = True
                     break
                     
                 chunk_text = chunk.choices[0].delta.content
@@ -418,25 +643,178 @@ Return the cleaned report in flawless markdown format. No explanations or commen
                     accumulated_text += chunk_text
                     buffer += chunk_text
                     
-                    if any(char in buffer for char in ['.', '!', '?', '\n']) and len(buffer) > 10:
-                        if websocket_manager := state.get('websocket_manager'):
-                            if job_id := state.get('job_id'):
-                                await websocket_manager.send_status_update(
-                                    job_id=job_id,
-                                    status="report_chunk",
-                                    message="Formatting final report",
-                                    result={
-                                        "chunk": buffer,
-                                        "step": "Editor"
-                                    }
-                                )
+                    now = time.monotonic()
+                    if len(buffer) >= _STREAM_FLUSH_CHARS or (
+                        len(buffer) >= _STREAM_FLUSH_MIN_CHARS and now - last_flush >= _STREAM_FLUSH_INTERVAL
+                    ):
+                        send_task = asyncio.create_task(send_chunk(send_task, buffer))
                         buffer = ""
+                        last_flush = now
+
+            # Send the tail even when the stream ended early so the client sees
+            # everything that is returned.
+            if buffer:
+                send_task = asyncio.create_task(send_chunk(send_task, buffer))
+            if send_task:
+                await send_task
             
-            return (accumulated_text or "").strip()
+            final_text = (accumulated_text or "").strip()
+            # A stream cut short (e.g. finish_reason "length") would cache a truncated report.
+            if completed and final_text:
+                self.llm_cache.set(cache_key, final_text)
+            return final_text
         except Exception as e:
-            logger.error(f"Error in formatting: {e}")
+            logger.error("Error in formatting: %s", e)
             return (content or "").strip()
 
+    async def run_batch(self, states: List[ResearchState], compile_batch_id: Optional[str] = None,
+                        sweep_batch_id: Optional[str] = None) -> List[ResearchState]:
+        """Compile reports for many companies through the OpenAI Batch API.
+
+        Intended for offline bulk jobs (nightly refresh, onboarding) called with
+        many states at once, not for the interactive graph: batched requests are
+        cheaper and use a separate rate-limit pool, but may take up to 24 hours.
+        All compile prompts go out in one batch; the content sweep and product
+        recommendation prompts for the compiled reports go out in a second.
+
+        The batch IDs are logged and stored under ``state['editor']``. Passing
+        them back in with the same ``states`` resumes waiting on those batches
+        instead of submitting (and paying for) them again. Failures are recorded
+        rather than raised: a failed compile batch sets ``state['error']``, and a
+        failed sweep batch falls back to the compiled report and sets
+        ``state['editor']['sweep_error']``.
+        """
+        jobs = []
+        for index, state in enumerate(states):
+            briefings = {
+                category: content
+                for category, key in _BRIEFING_KEYS.items()
+                if (content := state.get(key))
+            }
+            if not briefings:
+                logger.error("No briefings found in state for %s", state.get('company'))
+                continue
+            if 'editor' not in state or not isinstance(state['editor'], dict):
+                state['editor'] = {}
+            jobs.append({
+                "id": str(index),
+                "state": state,
+                "context": {
+                    "company": state.get('company', 'Unknown Company'),
+                    "industry": state.get('industry', 'Unknown'),
+                    "hq_location": state.get('hq_location', 'Unknown')
+                },
+                "combined_content": "\n\n".join(briefings.values())
+            })
+        if not jobs:
+            return states
+
+        try:
+            if compile_batch_id is None:
+                compile_batch_id = await submit_batch(self.openai_client, [
+                    {
+                        "custom_id": f"compile-{job['id']}",
+                        "body": {
+                            "model": "gpt-4.1",
+                            "messages": _compile_messages(
+                                job["context"]["company"], job["context"]["industry"],
+                                job["context"]["hq_location"], job["combined_content"]
+                            ),
+                            "temperature": 0
+                        }
+                    }
+                    for job in jobs
+                ])
+            for job in jobs:
+                job["state"]["editor"]["compile_batch_id"] = compile_batch_id
+            compiled = await wait_for_batch(self.openai_client, compile_batch_id)
+        except Exception as e:
+            logger.error("OpenAI compile batch %s failed: %s", compile_batch_id, e)
+            for job in jobs:
+                job["state"]["error"] = f"Batch compilation failed: {e}"
+            return states
+
+        for job in jobs:
+            edited_report = response_text(compiled.get(f"compile-{job['id']}"))
+            if edited_report is None:
+                logger.error("Batch compilation failed for %s", job['context']['company'])
+                edited_report = job["combined_content"].strip()
+            if reference_text := _reference_text(job["state"]):
+                edited_report = f"{edited_report}\n\n{reference_text}"
+            job["edited_report"] = edited_report
+
+        swept: Dict[str, Optional[Dict[str, Any]]] = {}
+        try:
+            if sweep_batch_id is None:
+                product_context = ""
+                try:
+                    product_context = await get_products_context()
+                except Exception as e:
+                    logger.error("Gagal memuat daftar produk: %s", e)
+
+                sweep_items = []
+                for job in jobs:
+                    context = job["context"]
+                    sweep_items.append({
+                        "custom_id": f"sweep-{job['id']}",
+                        "body": {
+                            "model": "gpt-4.1-mini",
+                            "messages": _sweep_messages(
+                                context["company"], context["industry"],
+                                context["hq_location"], job["edited_report"]
+                            ),
+                            "temperature": 0
+                        }
+                    })
+                    if product_context and not _is_non_operational(job["edited_report"]):
+                        sweep_items.append({
+                            "custom_id": f"recommend-{job['id']}",
+                            "body": {
+                                "model": "gpt-4.1",
+                                "messages": _recommendation_messages(context, job["edited_report"], product_context),
+                                "temperature": 0.3
+                            }
+                        })
+                sweep_batch_id = await submit_batch(self.openai_client, sweep_items)
+            for job in jobs:
+                job["state"]["editor"]["sweep_batch_id"] = sweep_batch_id
+            swept = await wait_for_batch(self.openai_client, sweep_batch_id)
+        except Exception as e:
+            # Like a failed live content_sweep, fall back to the compiled report.
+            logger.error("OpenAI sweep batch %s failed: %s", sweep_batch_id, e)
+            for job in jobs:
+                job["state"]["editor"]["sweep_error"] = str(e)
+
+        for job in jobs:
+            state = job["state"]
+            final_report = response_text(swept.get(f"sweep-{job['id']}")) or job["edited_report"]
+
+            product_recommendation = []
+            if recommendation_json_str := response_text(swept.get(f"recommend-{job['id']}")):
+                try:
+                    product_recommendation = orjson.loads(_strip_fences(recommendation_json_str))
+                except Exception as e:
+                    logger.error("Gagal parse rekomendasi produk AI: %s", e)
+
+            state['report'] = final_report
+            state['status'] = "editor_complete"
+            state['product_recommendation'] = product_recommendation
+            state['editor']['report'] = final_report
+
+            await _StatusSender(state)(
+                status="editor_complete",
+                message="Research report completed",
+                result={
+                    "step": "Editor",
+                    "report": final_report,
+                    "company": job["context"]["company"],
+                    "is_final": True,
+                    "status": "completed",
+                    "product_recommendation": product_recommendation
+                }
+            )
+        return states
+
     async def run(self, state: ResearchState) -> ResearchState:
         state = await self.compile_briefings(state)
         # Ensure the Editor node's output is stored both top-level and under "editor"
@@ -1,11 +1,124 @@
-import psycopg2
+import asyncio
+import hashlib
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
 
-def get_connection():
-    return psycopg2.connect(
-        dbname=os.getenv("BJB_DB_NAME"),
-        user=os.getenv("BJB_DB_USER"),
-        password=os.getenv("BJB_DB_PASSWORD"),
-        host=os.getenv("BJB_DB_HOST"),
-        port=os.getenv("BJB_DB_PORT", 5432)
-    )
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+_POOL: Optional[AsyncConnectionPool] = None
+_POOL_LOCK = asyncio.Lock()
+
+# (expiry timestamp, sha256 etag of the catalog, formatted product context)
+_PRODUCTS_CACHE: Optional[Tuple[float, str, str]] = None
+_PRODUCTS_LOCK = asyncio.Lock()
+
+async def _get_pool() -> AsyncConnectionPool:
+    """Create and open the shared connection pool on first use.
+
+    The pool is built lazily so the BJB_DB_* variables loaded from .env at
+    application startup are picked up.
+    """
+    global _POOL
+    if _POOL is None:
+        async with _POOL_LOCK:
+            if _POOL is None:
+                pool = AsyncConnectionPool(
+                    make_conninfo(
+                        dbname=os.getenv("BJB_DB_NAME"),
+                        user=os.getenv("BJB_DB_USER"),
+                        password=os.getenv("BJB_DB_PASSWORD"),
+                        host=os.getenv("BJB_DB_HOST"),
+                        port=os.getenv("BJB_DB_PORT", 5432)
+                    ),
+                    min_size=1,
+                    max_size=int(os.getenv("BJB_DB_POOL_MAX", "10")),
+                    open=False
+                )
+                await pool.open()
+                _POOL = pool
+    return _POOL
+
+async def close_pool() -> None:
+    """Close the shared connection pool, if it was opened."""
+    global _POOL
+    async with _POOL_LOCK:
+        if _POOL is not None:
+            await _POOL.close()
+            _POOL = None
+
+@asynccontextmanager
+async def get_connection() -> AsyncIterator[AsyncConnection]:
+    """Borrow a pooled connection, committing on success and rolling back on error."""
+    pool = await _get_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+# Formats each product row server-side so the catalog arrives as one string.
+# The result is a single row, so a named (server-side) cursor would only add
+# DECLARE/FETCH round trips: client memory is bounded by the prompt string the
+# caller needs anyway, regardless of how many products exist.
+_PRODUCTS_CONTEXT_QUERY = """
+SELECT string_agg(
+    format(
+        E'- [ID: %s] %s\\n  Deskripsi: %s\\n  Catatan: %s\\n  Prioritas: %s\\n  Link: %s\\n',
+        id,
+        name,
+        COALESCE(description, '-'),
+        COALESCE(note, '-'),
+        COALESCE(priority::text, '-'),
+        COALESCE(link, '-')
+    ),
+    E'\\n' ORDER BY id
+)
+FROM products
+WHERE deleted_at IS NULL
+"""
+
+async def _load_products() -> Tuple[str, str]:
+    """Fetch the active products and return (etag, formatted context)."""
+    async with get_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(_PRODUCTS_CONTEXT_QUERY)
+            row = await cursor.fetchone()
+            context = (row[0] if row else None) or ""
+
+    etag = hashlib.sha256(context.encode("utf-8")).hexdigest()
+    return etag, context
+
+async def get_products_context(ttl: float = 300) -> str:
+    """Return the product catalog formatted for the recommendation prompt.
+
+    The formatted string is cached in-process for ``ttl`` seconds since the
+    products table changes rarely.
+    """
+    global _PRODUCTS_CACHE
+    cached = _PRODUCTS_CACHE
+    if cached is not None and time.monotonic() < cached[0]:
+        return cached[2]
+
+    async with _PRODUCTS_LOCK:
+        cached = _PRODUCTS_CACHE
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[2]
+        etag, context = await _load_products()
+        _PRODUCTS_CACHE = (time.monotonic() + ttl, etag, context)
+        return context
+
+def get_products_etag() -> Optional[str]:
+    """Return the sha256 etag of the cached catalog, if it has been loaded."""
+    cached = _PRODUCTS_CACHE
+    return cached[1] if cached is not None else None
+
+def invalidate_products_context(etag: Optional[str] = None) -> None:
+    """Drop the cached catalog.
+
+    When ``etag`` is given the cache is only dropped if it still holds that
+    version, so a stale invalidation does not evict a fresher load.
+    """
+    global _PRODUCTS_CACHE
+    if etag is None or (_PRODUCTS_CACHE is not None and _PRODUCTS_CACHE[1] == etag):
+        _PRODUCTS_CACHE = None
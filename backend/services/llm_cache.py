@@ -0,0 +1,103 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+from cachetools import TTLCache
+
+
+def _cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class LLMResponseCache:
+    """In-process cache for chat completion responses.
+
+    Exact matches are keyed by a sha256 of (model, messages, temperature).
+    An optional semantic tier keeps embeddings of the variable part of a
+    prompt under a caller-supplied scope (e.g. model, company and catalog
+    version) and returns a cached response when a new embedding in the same
+    scope is close enough to a previous one.
+    """
+
+    # Only a handful of near-duplicate variants are kept per scope, so a
+    # lookup compares against a few vectors rather than the whole cache.
+    semantic_entries_per_scope = 4
+
+    def __init__(self, maxsize: int = 256, ttl: int = 86400,
+                 semantic_enabled: bool = False, semantic_threshold: float = 0.92):
+        self.ttl = ttl
+        self.semantic_enabled = semantic_enabled
+        self.semantic_threshold = semantic_threshold
+        self.stats = {"hits": 0, "misses": 0}
+        self._exact: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # scope -> deque of (embedding, response)
+        self._semantic: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], temperature: float) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._exact.get(key)
+
+    def set(self, key: str, response: str) -> None:
+        with self._lock:
+            self._exact[key] = response
+
+    def get_similar(self, scope: Hashable, embedding: List[float]) -> Optional[str]:
+        """Return the best cached response in ``scope`` above the similarity threshold."""
+        with self._lock:
+            entries = list(self._semantic.get(scope, ()))
+        best_score, best_response = self.semantic_threshold, None
+        for cached_embedding, response in entries:
+            score = _cosine_similarity(embedding, cached_embedding)
+            if score >= best_score:
+                best_score, best_response = score, response
+        return best_response
+
+    def add_similar(self, scope: Hashable, embedding: List[float], response: str) -> None:
+        with self._lock:
+            entries = self._semantic.get(scope)
+            if entries is None:
+                entries = deque(maxlen=self.semantic_entries_per_scope)
+            entries.append((embedding, response))
+            # Re-assign so the scope's TTL restarts from the latest entry.
+            self._semantic[scope] = entries
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.stats["hits"] += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+
+
+_CACHE: Optional[LLMResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide response cache, configured from LLM_CACHE_* on first use."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = LLMResponseCache(
+                    maxsize=int(os.getenv("LLM_CACHE_MAXSIZE", "256")),
+                    ttl=int(os.getenv("LLM_CACHE_TTL", "86400")),
+                    semantic_enabled=os.getenv("LLM_SEMANTIC_CACHE", "false").lower() == "true",
+                    semantic_threshold=float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+                )
+    return _CACHE
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import orjson
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+
+async def submit_batch(client: AsyncOpenAI, items: List[Dict[str, Any]],
+                       endpoint: str = CHAT_COMPLETIONS_ENDPOINT) -> str:
+    """Upload requests as a JSONL file and submit them as an OpenAI batch.
+
+    Each item needs a unique ``custom_id`` and the request ``body``.
+    Returns the batch ID.
+    """
+    lines = [
+        orjson.dumps({
+            "custom_id": item["custom_id"],
+            "method": "POST",
+            "url": endpoint,
+            "body": item["body"]
+        })
+        for item in items
+    ]
+    batch_file = await client.files.create(
+        file=("batch.jsonl", b"\n".join(lines)),
+        purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=endpoint,
+        completion_window="24h"
+    )
+    logger.info("Submitted OpenAI batch %s with %d requests", batch.id, len(items))
+    return batch.id
+
+async def wait_for_batch(client: AsyncOpenAI, batch_id: str, poll_interval: float = 30.0,
+                         max_poll_failures: int = 10) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Poll a batch until it finishes and return response bodies by custom_id.
+
+    Requests that errored map to None. Expired batches return whatever
+    completed before the deadline. A failed poll is retried on the next
+    interval; only ``max_poll_failures`` consecutive failures give up.
+    """
+    poll_failures = 0
+    while True:
+        try:
+            batch = await client.batches.retrieve(batch_id)
+        except Exception as e:
+            poll_failures += 1
+            if poll_failures >= max_poll_failures:
+                raise
+            logger.warning("Polling OpenAI batch %s failed (%d/%d): %s", batch_id, poll_failures, max_poll_failures, e)
+            await asyncio.sleep(poll_interval)
+            continue
+        poll_failures = 0
+        if batch.status in ("completed", "expired"):
+            break
+        if batch.status in ("failed", "cancelled"):
+            raise RuntimeError(f"OpenAI batch {batch_id} {batch.status}: {batch.errors}")
+        await asyncio.sleep(poll_interval)
+
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            results[record["custom_id"]] = response.get("body") if response.get("status_code") == 200 else None
+
+    logger.info("OpenAI batch %s %s with %d responses", batch_id, batch.status, len(results))
+    return results
+
+def response_text(body: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Extract the assistant message from a chat completion response body."""
+    if not body:
+        return None
+    try:
+        return body["choices"][0]["message"]["content"].strip()
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return None